@@ -17,6 +17,21 @@ from pathlib import Path
 def generate_factory_defaults(schema_file: str, output_file: str) -> None:
     """Generate config_factory_generated.c from JSON schema"""
     
+    # The stamp records the last successful check. The output's own mtime can't
+    # be used: it deliberately stays old when the generated content is unchanged.
+    stamp_file = output_file + '.stamp'
+    
+    # Nothing to do if the last check is newer than both the schema and this script
+    try:
+        os.stat(output_file)
+        stamp_mtime = os.stat(stamp_file).st_mtime
+        in_mtime = max(os.stat(schema_file).st_mtime, os.stat(__file__).st_mtime)
+        if stamp_mtime >= in_mtime:
+            print(f"Up to date: {output_file}")
+            return
+    except FileNotFoundError:
+        pass  # Missing output, stamp or schema - handled below
+    
     # Parse JSON schema
     try:
         with open(schema_file, 'r', encoding='utf-8') as f:
@@ -58,101 +73,113 @@ def generate_factory_defaults(schema_file: str, output_file: str) -> None:
     # Convert to compact JSON string
     json_defaults = json.dumps(config_entries, separators=(',', ':'), ensure_ascii=False)
     
-    # Generate C code with embedded JSON
-    lines = []
-    lines.append("// Auto-generated from config_schema.json - DO NOT EDIT MANUALLY")
-    lines.append("// Generator: tools/generate_config_factory.py")
-    lines.append("")
-    lines.append("#include \"config_manager.h\"")
-    lines.append("#include \"esp_log.h\"")
-    lines.append("#include \"esp_system.h\"")
-    lines.append("#include \"nvs.h\"")
-    lines.append("#include \"freertos/FreeRTOS.h\"")
-    lines.append("#include \"freertos/task.h\"")
-    lines.append("#include <stdbool.h>")
-    lines.append("")
-    lines.append("static const char *TAG = \"config_factory\";")
-    lines.append("")
-    
-    # Generate config_write_factory_defaults()
-    lines.append("/**")
-    lines.append(" * @brief Write factory default values to NVS")
-    lines.append(" * ")
-    lines.append(" * This function is auto-generated from config_schema.json.")
-    lines.append(" * It writes all default configuration values to NVS storage")
-    lines.append(" * using the bulk JSON API with structured format: [{key, type, value}, ...]")
-    lines.append(" */")
-    lines.append("void config_write_factory_defaults(void)")
-    lines.append("{")
-    lines.append("    ESP_LOGI(TAG, \"Writing factory defaults to NVS...\");")
-    lines.append("")
-    lines.append("    // Structured JSON array with factory defaults")
-    lines.append(f"    const char *factory_json = \"{json_defaults.replace(chr(34), chr(92) + chr(34))}\";")
-    lines.append("")
-    lines.append("    esp_err_t ret = config_set_all_from_json(factory_json);")
-    lines.append("    if (ret == ESP_OK) {")
-    lines.append("        ESP_LOGI(TAG, \"Factory defaults written successfully\");")
-    lines.append("    } else {")
-    lines.append("        ESP_LOGE(TAG, \"Failed to write factory defaults: %s\", esp_err_to_name(ret));")
-    lines.append("    }")
-    lines.append("}")
-    lines.append("")
-    
-    # Generate config_validate_or_reset()
-    lines.append("/**")
-    lines.append(" * @brief Check if all required configuration keys exist")
-    lines.append(" * ")
-    lines.append(" * This function is auto-generated from config_schema.json.")
-    lines.append(" * It verifies that all mandatory parameters are present in NVS.")
-    lines.append(" * If any are missing, it writes factory defaults and triggers a restart.")
-    lines.append(" * ")
-    lines.append(" * @return true if all keys exist, false if defaults were written and restart triggered")
-    lines.append(" */")
-    lines.append("bool config_validate_or_reset(void)")
-    lines.append("{")
-    lines.append("    ESP_LOGI(TAG, \"Validating configuration completeness...\");")
-    lines.append("    ")
-    lines.append("    bool missing_keys = false;")
-    lines.append("    int32_t test_int;")
-    lines.append("    char test_str[64];")
-    lines.append("    ")
+    # Embed the JSON as a C string literal. json.dumps escapes quotes and
+    # backslashes exactly as C needs them and adds the surrounding quotes.
+    c_json_literal = json.dumps(json_defaults, ensure_ascii=False)
     
     # Generate validation checks for each required key
+    validation_checks = ''
     for key, ftype in required_keys:
         if ftype == 'integer':
-            lines.append(f"    if (config_get_int32(\"{key}\", &test_int) == ESP_ERR_NVS_NOT_FOUND) {{")
+            validation_checks += f"    if (config_get_int32(\"{key}\", &test_int) == ESP_ERR_NVS_NOT_FOUND) {{\n"
         elif ftype in ['string', 'password']:
-            lines.append(f"    if (config_get_string(\"{key}\", test_str, sizeof(test_str)) == ESP_ERR_NVS_NOT_FOUND) {{")
-        lines.append(f"        ESP_LOGW(TAG, \"Missing key: {key}\");")
-        lines.append("        missing_keys = true;")
-        lines.append("    }")
-    
-    lines.append("    ")
-    lines.append("    if (missing_keys) {")
-    lines.append("        ESP_LOGW(TAG, \"Configuration incomplete - writing factory defaults...\");")
-    lines.append("        esp_err_t ret = config_factory_reset();")
-    lines.append("        if (ret != ESP_OK) {")
-    lines.append("            ESP_LOGE(TAG, \"Failed to write factory defaults: %s\", esp_err_to_name(ret));")
-    lines.append("            return false;")
-    lines.append("        }")
-    lines.append("        ")
-    lines.append("        ESP_LOGI(TAG, \"✓ Factory defaults written successfully\");")
-    lines.append("        ESP_LOGI(TAG, \"System will restart in 3 seconds to apply configuration...\");")
-    lines.append("        vTaskDelay(pdMS_TO_TICKS(3000));")
-    lines.append("        esp_restart();")
-    lines.append("        return false;  // Never reached, but makes return path explicit")
-    lines.append("    }")
-    lines.append("    ")
-    lines.append("    ESP_LOGI(TAG, \"✓ Configuration validation passed\");")
-    lines.append("    return true;")
-    lines.append("}")
-    lines.append("")
+            validation_checks += f"    if (config_get_string(\"{key}\", test_str, sizeof(test_str)) == ESP_ERR_NVS_NOT_FOUND) {{\n"
+        validation_checks += (
+            f"        ESP_LOGW(TAG, \"Missing key: {key}\");\n"
+            "        missing_keys = true;\n"
+            "    }\n"
+        )
+    
+    # Generate C code with embedded JSON
+    new_content = f'''// Auto-generated from config_schema.json - DO NOT EDIT MANUALLY
+// Generator: tools/generate_config_factory.py
+
+#include "config_manager.h"
+#include "esp_log.h"
+#include "esp_system.h"
+#include "nvs.h"
+#include "freertos/FreeRTOS.h"
+#include "freertos/task.h"
+#include <stdbool.h>
+
+static const char *TAG = "config_factory";
+
+/**
+ * @brief Write factory default values to NVS
+ * 
+ * This function is auto-generated from config_schema.json.
+ * It writes all default configuration values to NVS storage
+ * using the bulk JSON API with structured format: [{{key, type, value}}, ...]
+ */
+void config_write_factory_defaults(void)
+{{
+    ESP_LOGI(TAG, "Writing factory defaults to NVS...");
+
+    // Structured JSON array with factory defaults
+    const char *factory_json = {c_json_literal};
+
+    esp_err_t ret = config_set_all_from_json(factory_json);
+    if (ret == ESP_OK) {{
+        ESP_LOGI(TAG, "Factory defaults written successfully");
+    }} else {{
+        ESP_LOGE(TAG, "Failed to write factory defaults: %s", esp_err_to_name(ret));
+    }}
+}}
+
+/**
+ * @brief Check if all required configuration keys exist
+ * 
+ * This function is auto-generated from config_schema.json.
+ * It verifies that all mandatory parameters are present in NVS.
+ * If any are missing, it writes factory defaults and triggers a restart.
+ * 
+ * @return true if all keys exist, false if defaults were written and restart triggered
+ */
+bool config_validate_or_reset(void)
+{{
+    ESP_LOGI(TAG, "Validating configuration completeness...");
+    
+    bool missing_keys = false;
+    int32_t test_int;
+    char test_str[64];
+    
+{validation_checks}    
+    if (missing_keys) {{
+        ESP_LOGW(TAG, "Configuration incomplete - writing factory defaults...");
+        esp_err_t ret = config_factory_reset();
+        if (ret != ESP_OK) {{
+            ESP_LOGE(TAG, "Failed to write factory defaults: %s", esp_err_to_name(ret));
+            return false;
+        }}
+        
+        ESP_LOGI(TAG, "✓ Factory defaults written successfully");
+        ESP_LOGI(TAG, "System will restart in 3 seconds to apply configuration...");
+        vTaskDelay(pdMS_TO_TICKS(3000));
+        esp_restart();
+        return false;  // Never reached, but makes return path explicit
+    }}
+    
+    ESP_LOGI(TAG, "✓ Configuration validation passed");
+    return true;
+}}
+'''
+    
+    # Skip the write if nothing changed, so the output mtime stays put and
+    # the build system doesn't recompile config_manager on every build
+    try:
+        if Path(output_file).read_bytes() == new_content.encode('utf-8'):
+            Path(stamp_file).touch()
+            print(f"Up to date: {output_file}")
+            return
+    except OSError:
+        pass  # Missing or unreadable - regenerate below
     
     # Write output file
     try:
         os.makedirs(os.path.dirname(output_file), exist_ok=True)
-        with open(output_file, 'w', encoding='utf-8') as f:
-            f.write('\n'.join(lines))
+        with open(output_file, 'w', encoding='utf-8', newline='') as f:
+            f.write(new_content)
+        Path(stamp_file).touch()
         print(f"Generated: {output_file}")
         print(f"  - Factory defaults: {len(config_entries)} parameters")
         print(f"  - Validation checks: {len(required_keys)} required keys")
@@ -1,10 +1,15 @@
 #!/bin/bash
 # Build Sphinx documentation (HTML)
-# Usage: ./build-docs.sh
+# Usage: ./build-docs.sh [--clean]
+#   --clean  Ignore the cached environment and rebuild every page
 set -e
 SCRIPT_DIR="$(cd "$(dirname "$0")" && pwd)"
 PROJECT_DIR="$(cd "$SCRIPT_DIR/../.." && pwd)"
 DOCS_DIR="$PROJECT_DIR/docs"
 BUILD_DIR="$DOCS_DIR/_build/html"
+SPHINX_OPTS=(-j auto)
+if [ "$1" = "--clean" ]; then
+    SPHINX_OPTS+=(-E)
+fi
 echo "Building Sphinx documentation in $BUILD_DIR ..."
-sphinx-build -b html "$DOCS_DIR" "$BUILD_DIR"
+sphinx-build -b html "${SPHINX_OPTS[@]}" "$DOCS_DIR" "$BUILD_DIR"
@@ -6,25 +6,45 @@ Forwards localhost:8080 -> 192.168.100.2:80
 Allows VS Code Simple Browser to access ESP32 webserver via GitHub port forwarding.
 
 Features:
-- Automatic retry with exponential backoff
+- Automatic retry once the ESP32 accepts connections again
+- Concurrent request handling (one thread per request)
+- Static assets (CSS, JS, icons) cached for a few seconds
 - Handles ESP32/QEMU restarts gracefully
 - Quiet mode (--quiet): Only logs errors
 - Errors logged to temp/proxy_errors.log
 """
+import http.client
 import http.server
+import logging
+import queue
+import random
+import re
+import socket
+import threading
 import urllib.request
 import urllib.error
-import socketserver
 import time
 import sys
 import os
+from collections import OrderedDict
 from datetime import datetime
+from logging.handlers import MemoryHandler, RotatingFileHandler
 from pathlib import Path
 
 PORT = 8080
-ESP32_URL = "http://192.168.100.2"
+ESP32_HOST = "192.168.100.2"
+ESP32_PORT = 80
+ESP32_POOL_SIZE = 4  # idle keep-alive connections kept (ESP32 httpd has only a few sockets)
+ESP32_URL = f"http://{ESP32_HOST}"
 MAX_RETRIES = 5
-INITIAL_BACKOFF = 0.5  # seconds
+READY_TIMEOUT = 15  # seconds a request waits for the ESP32 to come up
+PROBE_INTERVAL = 0.2  # seconds between readiness probes
+RETRY_INTERVAL = 1.0  # seconds between retries of a failed request (ESP32 reboots in ~2-3s)
+RETRY_JITTER = 0.2  # +/- seconds, so concurrent retries don't hit the ESP32 in lockstep
+STREAM_CHUNK_SIZE = 64 * 1024  # bytes copied per read when forwarding bodies
+STATIC_CACHE_TTL = 5.0  # seconds a cached static asset is served without asking the ESP32
+STATIC_CACHE_MAX_ENTRIES = 128
+STATIC_ASSET_RE = re.compile(r'\.(ico|css|js|svg|png|woff2?)$')
 
 # Parse command line arguments
 QUIET_MODE = '--quiet' in sys.argv
@@ -33,16 +53,25 @@ QUIET_MODE = '--quiet' in sys.argv
 SCRIPT_DIR = Path(__file__).parent.resolve()
 PROJECT_DIR = SCRIPT_DIR.parent.parent.parent
 ERROR_LOG = PROJECT_DIR / "temp" / "proxy_errors.log"
+ERROR_LOG_MAX_BYTES = 1024 * 1024  # rotate error log at 1 MiB
+ERROR_LOG_BACKUP_COUNT = 3
+
+logger = logging.getLogger('http_proxy')
+
+def setup_error_log():
+    """Attach a buffered, rotating file handler for ERROR_LOG (call once at startup)"""
+    file_handler = RotatingFileHandler(ERROR_LOG, maxBytes=ERROR_LOG_MAX_BYTES,
+                                       backupCount=ERROR_LOG_BACKUP_COUNT)
+    file_handler.setFormatter(logging.Formatter('[%(asctime)s] %(message)s',
+                                                datefmt='%Y-%m-%d %H:%M:%S'))
+    logger.addHandler(MemoryHandler(100, flushLevel=logging.ERROR, target=file_handler))
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
 
 def log_error(message):
     """Log errors to file and optionally to console"""
-    timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-    log_message = f"[{timestamp}] {message}\n"
-    
     # Always log to file
-    ERROR_LOG.parent.mkdir(parents=True, exist_ok=True)
-    with open(ERROR_LOG, 'a') as f:
-        f.write(log_message)
+    logger.error(message)
     
     # Also print if not in quiet mode
     if not QUIET_MODE:
@@ -53,47 +82,172 @@ def log_info(message):
     if not QUIET_MODE:
         print(message)
 
+# Connection-level headers that must not be forwarded to the client
+# (urllib/http.client already de-chunk the body and manage keep-alive)
+HOP_BY_HOP_HEADERS = {'connection', 'keep-alive', 'transfer-encoding'}
+
+# Idle keep-alive connections to the ESP32, shared by all handler threads
+_esp32_pool = queue.LifoQueue(maxsize=ESP32_POOL_SIZE)
+
+def checkout_esp32_connection():
+    """Take an idle ESP32 connection from the pool, or open a new one"""
+    try:
+        return _esp32_pool.get_nowait()
+    except queue.Empty:
+        return http.client.HTTPConnection(ESP32_HOST, ESP32_PORT, timeout=10)
+
+def release_esp32_connection(conn):
+    """Return a fully read connection to the pool, closing it if the pool is full"""
+    try:
+        _esp32_pool.put_nowait(conn)
+    except queue.Full:
+        conn.close()
+
+# Set while the ESP32 accepts connections, cleared when a forwarded request fails
+_esp32_ready = threading.Event()
+
+def probe_esp32_forever():
+    """Poll the ESP32 port and set _esp32_ready as soon as it accepts a connection"""
+    while True:
+        if not _esp32_ready.is_set():
+            try:
+                with socket.create_connection((ESP32_HOST, ESP32_PORT), timeout=1):
+                    _esp32_ready.set()
+            except OSError:
+                pass
+        time.sleep(PROBE_INTERVAL)
+
+# Short-lived LRU cache for static assets: path -> (fetch_time, status, headers, body)
+_static_cache = OrderedDict()
+_static_cache_lock = threading.Lock()
+
+def get_cached_asset(path):
+    """Return (status, headers, body) for a fresh cached asset, or None"""
+    with _static_cache_lock:
+        entry = _static_cache.get(path)
+        if entry is None:
+            return None
+        fetch_time, status, headers, body = entry
+        if time.monotonic() - fetch_time >= STATIC_CACHE_TTL:
+            del _static_cache[path]
+            return None
+        _static_cache.move_to_end(path)
+        return status, headers, body
+
+def cache_asset(path, status, headers, body):
+    """Store a static asset response, evicting the least recently used entry"""
+    with _static_cache_lock:
+        _static_cache[path] = (time.monotonic(), status, headers, body)
+        _static_cache.move_to_end(path)
+        if len(_static_cache) > STATIC_CACHE_MAX_ENTRIES:
+            _static_cache.popitem(last=False)
+
+def mark_esp32_unreachable():
+    """Clear readiness and drop cached assets (the ESP32 may come back with new firmware)
+
+    Only for failures connecting to or reading the response head from the ESP32 -
+    never for client-side errors, which would stall every other request.
+    """
+    _esp32_ready.clear()
+    with _static_cache_lock:
+        _static_cache.clear()
+
+def retry_delay():
+    """Return the pause before the next retry: fixed interval plus random jitter"""
+    return RETRY_INTERVAL + random.uniform(-RETRY_JITTER, RETRY_JITTER)
+
+def start_readiness_probe():
+    """Start the background readiness probe thread"""
+    threading.Thread(target=probe_esp32_forever, daemon=True).start()
+
 class ProxyHandler(http.server.SimpleHTTPRequestHandler):
+    def forward_response_head(self, status, headers):
+        """Send the ESP32 status line and headers in one pass, minus hop-by-hop headers"""
+        self.send_response(status)
+        for header, value in headers:
+            if header.lower() not in HOP_BY_HOP_HEADERS:
+                self.send_header(header, value)
+        self.end_headers()
+    
+    def forward_response_body(self, response):
+        """Stream the ESP32 body to the client; return False if either side failed.
+
+        Called after the head went out, so failures are only logged and the
+        client connection is dropped - no retry, no send_error.
+        """
+        while True:
+            try:
+                chunk = response.read(STREAM_CHUNK_SIZE)
+            except (http.client.HTTPException, OSError) as e:
+                log_error(f"ESP32 response for {self.path} broke off mid-body: {e}")
+                self.close_connection = True
+                return False
+            if not chunk:
+                return True
+            try:
+                self.wfile.write(chunk)
+            except OSError as e:
+                # Client went away (e.g. tab closed) - not an ESP32 problem
+                log_info(f"Client disconnected during {self.path}: {e}")
+                self.close_connection = True
+                return False
+    
     def do_GET(self):
         target_url = ESP32_URL + self.path
         
-        # Try to fetch from ESP32 with retry logic
+        # Serve repeated static asset requests without an ESP32 round-trip
+        is_static = STATIC_ASSET_RE.search(self.path.split('?', 1)[0]) is not None
+        if is_static:
+            cached = get_cached_asset(self.path)
+            if cached is not None:
+                status, headers, body = cached
+                try:
+                    self.forward_response_head(status, headers)
+                    self.wfile.write(body)
+                except OSError as e:
+                    log_info(f"Client disconnected during {self.path}: {e}")
+                    self.close_connection = True
+                    return
+                if not QUIET_MODE:
+                    log_info(f"✓ {self.path} -> {status} (cached)")
+                return
+        
+        # Try to fetch from ESP32 with retry logic (nothing is sent to the client yet)
         retry_count = 0
-        backoff = INITIAL_BACKOFF
         last_error = None
+        response = None
+        body = None
         
         while retry_count <= MAX_RETRIES:
+            # Block until the readiness probe sees the ESP32
+            if not _esp32_ready.wait(timeout=READY_TIMEOUT):
+                last_error = f"not reachable within {READY_TIMEOUT}s"
+                break
+            
             try:
-                with urllib.request.urlopen(target_url, timeout=10) as response:
-                    # Success! Forward the response
-                    self.send_response(response.status)
-                    for header, value in response.headers.items():
-                        self.send_header(header, value)
-                    self.end_headers()
-                    self.wfile.write(response.read())
+                response = urllib.request.urlopen(target_url, timeout=10)
+                if is_static and response.status == 200:
+                    # Static assets are small - read them whole so they can be cached
+                    with response:
+                        body = response.read()
+                    cache_asset(self.path, response.status, response.headers.items(), body)
+                break
                     
-                    if not QUIET_MODE:
-                        log_info(f"✓ {self.path} -> {response.status}")
-                    return
+            except urllib.error.HTTPError as e:
+                # The ESP32 answered with an error status (e.g. 404) - forward it as-is
+                response = e
+                break
                     
             except urllib.error.URLError as e:
                 last_error = e
+                # No HTTP answer at all - wait for the probe to see the ESP32 again
+                mark_esp32_unreachable()
                 if retry_count < MAX_RETRIES:
+                    delay = retry_delay()
                     if not QUIET_MODE:
-                        log_info(f"Retry {retry_count+1}/{MAX_RETRIES} for {self.path} (waiting {backoff:.1f}s)...")
-                    time.sleep(backoff)
-                    backoff *= 2  # Exponential backoff
-                    retry_count += 1
-                else:
-                    # Max retries reached, return error
-                    error_msg = f"Proxy error after {MAX_RETRIES} retries: {e}"
-                    log_error(error_msg)
-                    try:
-                        self.send_error(502, f"ESP32 unreachable: {e}")
-                    except (BrokenPipeError, ConnectionResetError):
-                        # Client disconnected, ignore
-                        pass
-                    return
+                        log_info(f"Retry {retry_count+1}/{MAX_RETRIES} for {self.path} (waiting {delay:.1f}s)...")
+                    time.sleep(delay)
+                retry_count += 1
                     
             except Exception as e:
                 error_msg = f"Unexpected proxy error: {e}"
@@ -104,124 +258,75 @@ class ProxyHandler(http.server.SimpleHTTPRequestHandler):
                     # Client disconnected, ignore
                     pass
                 return
+        
+        if response is None:
+            # Retries exhausted or ESP32 never came up, return error
+            error_msg = f"Proxy error after {retry_count} failed attempts: {last_error}"
+            log_error(error_msg)
+            try:
+                self.send_error(502, f"ESP32 unreachable: {last_error}")
+            except (BrokenPipeError, ConnectionResetError):
+                # Client disconnected, ignore
+                pass
+            return
+        
+        # Success! Forward the response - from here on nothing is retried
+        try:
+            try:
+                self.forward_response_head(response.status, response.headers.items())
+                if body is not None:
+                    self.wfile.write(body)
+            except OSError as e:
+                log_info(f"Client disconnected during {self.path}: {e}")
+                self.close_connection = True
+                return
+            if body is None and not self.forward_response_body(response):
+                return
+        finally:
+            response.close()
+        
+        if not QUIET_MODE:
+            log_info(f"✓ {self.path} -> {response.status}")
     
     def do_POST(self):
-        """Handle POST requests (for configuration API) - Direct TCP forwarding"""
-        import socket
-        
+        """Handle POST requests (for configuration API) - Forward over keep-alive connection"""
         # Read POST body from client
         content_length = int(self.headers.get('Content-Length', 0))
         post_data = self.rfile.read(content_length) if content_length > 0 else b''
+        request_headers = {
+            'Content-Type': self.headers.get('Content-Type', 'application/json'),
+        }
         
         retry_count = 0
-        backoff = INITIAL_BACKOFF
+        last_error = None
+        response = None
         
+        # Retry only until the ESP32 answers - nothing has been sent to the client yet
         while retry_count <= MAX_RETRIES:
+            # Block until the readiness probe sees the ESP32
+            if not _esp32_ready.wait(timeout=READY_TIMEOUT):
+                last_error = f"not reachable within {READY_TIMEOUT}s"
+                break
+            
+            conn = checkout_esp32_connection()
+            reused = conn.sock is not None
             try:
-                # Create raw HTTP request manually for ESP32
-                request_line = f"POST {self.path} HTTP/1.0\r\n"
-                headers = f"Host: 192.168.100.2\r\n"
-                headers += f"Content-Type: {self.headers.get('Content-Type', 'application/json')}\r\n"
-                headers += f"Content-Length: {len(post_data)}\r\n"
-                headers += f"Connection: close\r\n"
-                headers += "\r\n"
-                
-                http_request = request_line.encode('utf-8') + headers.encode('utf-8') + post_data
-                
-                # Connect directly to ESP32
-                sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-                sock.settimeout(10)
-                sock.connect(('192.168.100.2', 80))
-                sock.sendall(http_request)
-                
-                # Read response headers first
-                response_data = b''
-                header_complete = False
-                while not header_complete:
-                    chunk = sock.recv(1024)
-                    if not chunk:
-                        raise Exception("Connection closed before headers received")
-                    response_data += chunk
-                    if b'\r\n\r\n' in response_data:
-                        header_complete = True
-                
-                # Parse headers to get Content-Length
-                # Find header/body separator in bytes
-                header_sep = b'\r\n\r\n'
-                header_end_idx = response_data.find(header_sep)
-                if header_end_idx == -1:
-                    raise Exception("Invalid HTTP response: no header separator found")
-                
-                # Split headers and initial body data (both as bytes)
-                response_headers_bytes = response_data[:header_end_idx]
-                response_body_start = response_data[header_end_idx + len(header_sep):]
-                
-                # Decode headers to string for parsing
-                response_headers = response_headers_bytes.decode('utf-8', errors='ignore')
-                
-                # Extract status code
-                status_line = response_headers.split('\r\n')[0]
-                status_code = int(status_line.split()[1])
+                conn.request('POST', self.path, body=post_data, headers=request_headers)
+                response = conn.getresponse()
+                break
                 
-                # Extract Content-Length if present
-                content_length = None
-                for line in response_headers.split('\r\n')[1:]:
-                    if line.lower().startswith('content-length:'):
-                        content_length = int(line.split(':', 1)[1].strip())
-                        break
-                
-                # Read remaining body based on Content-Length (work with bytes)
-                body_data = response_body_start
-                if content_length is not None:
-                    # We know exactly how much to read
-                    while len(body_data) < content_length:
-                        remaining = content_length - len(body_data)
-                        chunk = sock.recv(min(remaining, 4096))
-                        if not chunk:
-                            break
-                        body_data += chunk
-                    response_body = body_data[:content_length].decode('utf-8', errors='ignore')
-                else:
-                    # No Content-Length, read until connection closes (old behavior)
-                    while True:
-                        chunk = sock.recv(4096)
-                        if not chunk:
-                            break
-                        body_data += chunk
-                    response_body = body_data.decode('utf-8', errors='ignore')
-                
-                sock.close()
-                
-                # Forward response to client
-                self.send_response(status_code)
-                for line in response_headers.split('\r\n')[1:]:
-                    if ':' in line:
-                        key, value = line.split(':', 1)
-                        self.send_header(key.strip(), value.strip())
-                self.end_headers()
-                self.wfile.write(response_body.encode('utf-8'))
+            except (http.client.HTTPException, OSError) as e:
+                conn.close()
+                if reused and not isinstance(e, TimeoutError):
+                    # ESP32 dropped an idle keep-alive connection - reconnect right away
+                    # (not on timeout: the ESP32 may already be handling this POST)
+                    continue
+                # Only conn.request()/getresponse() run here, so this is an ESP32 failure
+                mark_esp32_unreachable()
+                last_error = e
                 
-                if not QUIET_MODE:
-                    log_info(f"✓ POST {self.path} -> {status_code}")
-                return
-                    
-            except (socket.timeout, ConnectionRefusedError, OSError) as e:
-                if retry_count < MAX_RETRIES:
-                    if not QUIET_MODE:
-                        log_info(f"Retry {retry_count+1}/{MAX_RETRIES} for POST {self.path} (waiting {backoff:.1f}s)...")
-                    time.sleep(backoff)
-                    backoff *= 2
-                    retry_count += 1
-                else:
-                    error_msg = f"Proxy error after {MAX_RETRIES} retries: {e}"
-                    log_error(error_msg)
-                    try:
-                        self.send_error(502, f"ESP32 unreachable: {e}")
-                    except (BrokenPipeError, ConnectionResetError):
-                        pass
-                    return
-                    
             except Exception as e:
+                conn.close()
                 error_msg = f"Unexpected proxy error on POST: {e}"
                 log_error(error_msg)
                 try:
@@ -229,6 +334,40 @@ class ProxyHandler(http.server.SimpleHTTPRequestHandler):
                 except (BrokenPipeError, ConnectionResetError):
                     pass
                 return
+            
+            if retry_count < MAX_RETRIES:
+                delay = retry_delay()
+                if not QUIET_MODE:
+                    log_info(f"Retry {retry_count+1}/{MAX_RETRIES} for POST {self.path} (waiting {delay:.1f}s)...")
+                time.sleep(delay)
+            retry_count += 1
+        
+        if response is None:
+            error_msg = f"Proxy error after {retry_count} failed attempts: {last_error}"
+            log_error(error_msg)
+            try:
+                self.send_error(502, f"ESP32 unreachable: {last_error}")
+            except (BrokenPipeError, ConnectionResetError):
+                pass
+            return
+        
+        # Forward response to client. Once the head is out, a failure can neither
+        # be retried nor reported with send_error - just drop the connection.
+        try:
+            self.forward_response_head(response.status, response.getheaders())
+        except OSError as e:
+            conn.close()
+            log_info(f"Client disconnected during POST {self.path}: {e}")
+            self.close_connection = True
+            return
+        if not self.forward_response_body(response):
+            # Unread body left on the connection - it can't be reused
+            conn.close()
+            return
+        release_esp32_connection(conn)
+        
+        if not QUIET_MODE:
+            log_info(f"✓ POST {self.path} -> {response.status}")
     
     def do_OPTIONS(self):
         """Handle OPTIONS requests (CORS preflight)"""
@@ -237,10 +376,7 @@ class ProxyHandler(http.server.SimpleHTTPRequestHandler):
         try:
             req = urllib.request.Request(target_url, method='OPTIONS')
             with urllib.request.urlopen(req, timeout=5) as response:
-                self.send_response(response.status)
-                for header, value in response.headers.items():
-                    self.send_header(header, value)
-                self.end_headers()
+                self.forward_response_head(response.status, response.headers.items())
                 
                 if not QUIET_MODE:
                     log_info(f"✓ OPTIONS {self.path} -> {response.status}")
@@ -262,12 +398,7 @@ class ProxyHandler(http.server.SimpleHTTPRequestHandler):
 if __name__ == "__main__":
     # Always log startup (even in quiet mode) for debugging
     timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-    startup_msg = f"[{timestamp}] HTTP Proxy starting on http://localhost:{PORT} -> {ESP32_URL}"
-    
-    # Create log directory and write startup message
-    ERROR_LOG.parent.mkdir(parents=True, exist_ok=True)
-    with open(ERROR_LOG, 'w') as f:  # Overwrite on startup
-        f.write(startup_msg + "\n")
+    startup_log = [f"[{timestamp}] HTTP Proxy starting on http://localhost:{PORT} -> {ESP32_URL}"]
     
     log_info(f"HTTP Proxy starting on http://localhost:{PORT}")
     log_info(f"Forwarding to ESP32 at {ESP32_URL}")
@@ -275,23 +406,30 @@ if __name__ == "__main__":
         log_info(f"Quiet mode: Errors logged to {ERROR_LOG}")
     log_info("Press Ctrl+C to stop\n")
     
+    # ThreadingHTTPServer already enables SO_REUSEADDR and daemon request threads
+    bind_error = None
     try:
-        # Enable SO_REUSEADDR to allow immediate port reuse after restart
-        socketserver.TCPServer.allow_reuse_address = True
-        
-        with socketserver.TCPServer(("", PORT), ProxyHandler) as httpd:
-            # Log successful binding
-            success_msg = f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] Proxy successfully bound to port {PORT}"
-            with open(ERROR_LOG, 'a') as f:
-                f.write(success_msg + "\n")
-            
-            try:
-                httpd.serve_forever()
-            except KeyboardInterrupt:
-                log_info("\nProxy stopped")
+        httpd = http.server.ThreadingHTTPServer(("", PORT), ProxyHandler)
+        startup_log.append(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] Proxy successfully bound to port {PORT}")
     except OSError as e:
-        error_msg = f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] FATAL: Failed to bind to port {PORT}: {e}"
-        with open(ERROR_LOG, 'a') as f:
-            f.write(error_msg + "\n")
-        log_error(f"Failed to start proxy: {e}")
+        bind_error = e
+        startup_log.append(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] FATAL: Failed to bind to port {PORT}: {e}")
+    
+    # Create log directory and write all startup messages at once (overwrite on startup)
+    ERROR_LOG.parent.mkdir(parents=True, exist_ok=True)
+    with open(ERROR_LOG, 'w') as f:
+        f.write('\n'.join(startup_log) + '\n')
+    
+    if bind_error is not None:
+        if not QUIET_MODE:
+            print(f"Failed to start proxy: {bind_error}", file=sys.stderr)
         sys.exit(1)
+    
+    setup_error_log()
+    start_readiness_probe()
+    
+    with httpd:
+        try:
+            httpd.serve_forever()
+        except KeyboardInterrupt:
+            log_info("\nProxy stopped")
@@ -6,12 +6,25 @@ import http.server
 import socketserver
 import os
 import sys
+from http import HTTPStatus
 from pathlib import Path
 from urllib.parse import urlparse
 
 class WebFlasherHandler(http.server.SimpleHTTPRequestHandler):
     """Custom handler that redirects root to web-flasher.html"""
     
+    # Content types of the files the flasher serves; guess_type() checks this
+    # dict before falling back to the mimetypes registry
+    extensions_map = {
+        **http.server.SimpleHTTPRequestHandler.extensions_map,
+        '.html': 'text/html',
+        '.js': 'text/javascript',
+        '.css': 'text/css',
+        '.bin': 'application/octet-stream',
+        '.json': 'application/json',
+        '.wasm': 'application/wasm',
+    }
+    
     def end_headers(self):
         # Add CORS headers for local development
         self.send_header('Access-Control-Allow-Origin', '*')
@@ -19,6 +32,14 @@ class WebFlasherHandler(http.server.SimpleHTTPRequestHandler):
         self.send_header('Access-Control-Allow-Headers', 'Content-Type')
         super().end_headers()
     
+    def copyfile(self, source, outputfile):
+        # Hand file bodies (firmware binaries) to the kernel via sendfile();
+        # socket.sendfile() falls back to plain send() where unsupported
+        if outputfile is self.wfile:
+            self.connection.sendfile(source)
+        else:
+            super().copyfile(source, outputfile)
+    
     def do_GET(self):
         try:
             parsed_path = urlparse(self.path)
@@ -40,39 +61,27 @@ class WebFlasherHandler(http.server.SimpleHTTPRequestHandler):
             except:
                 pass  # If we can't even send error, just continue
     
+    def log_request(self, code='-', size='-'):
+        # Custom logging - format from the status code instead of parsing the log line
+        if isinstance(code, HTTPStatus):
+            code = code.value
+        request = self.requestline
+        
+        if code == 200:
+            print(f"✅ {request} - 200 OK")
+        elif code == 304:
+            print(f"📄 {request} - 304 Not Modified")
+        elif code == 302:
+            print(f"↪️  {request} - 302 Redirect")
+        elif code == 404:
+            if 'favicon' not in self.path and 'well-known' not in self.path:
+                print(f"❌ {request} - 404 NOT FOUND ← THIS IS THE PROBLEM!")
+        else:
+            print(f"📝 {request} - {code}")
+    
     def log_message(self, format, *args):
-        # Custom logging - just use default format but make it prettier
-        try:
-            # Extract the actual request line from format string
-            msg = format % args
-            
-            # Check what type of request this is
-            if '"GET' in msg:
-                # Parse: "GET /path HTTP/1.1" status -
-                parts = msg.split('"')
-                if len(parts) >= 2:
-                    request = parts[1]  # e.g. "GET /path HTTP/1.1"
-                    path = request.split()[1] if len(request.split()) > 1 else 'unknown'
-                    status = parts[2].strip().split()[0] if len(parts) > 2 else 'unknown'
-                    
-                    if status == '200':
-                        print(f"✅ {request} - 200 OK")
-                    elif status == '304':
-                        print(f"📄 {request} - 304 Not Modified")
-                    elif status == '302':
-                        print(f"↪️  {request} - 302 Redirect")
-                    elif status == '404':
-                        if 'favicon' not in path and 'well-known' not in path:
-                            print(f"❌ {request} - 404 NOT FOUND ← THIS IS THE PROBLEM!")
-                    else:
-                        print(f"📝 {msg}")
-                else:
-                    print(f"📝 {msg}")
-            else:
-                print(f"📝 {msg}")
-        except Exception as e:
-            # Fallback to default
-            print(f"📝 {format % args}")
+        # Remaining messages (e.g. send_error details)
+        print(f"📝 {format % args}")
 
 if __name__ == '__main__':
     PORT = 8001